@@ -0,0 +1,6 @@
+"""Run the Nuvo command line tool, see cli.py."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,252 @@
+"""Command line tool for a Nuvo controller: status dumps, batch commands and link benchmarks.
+
+Run from the directory holding the component, i.e.
+    python -m nuvo /dev/ttyUSB0 status
+    python -m nuvo socket://192.168.1.20:4999 bench --iterations 50
+    python -m nuvo socket://localhost:4999 emulate    # stand-in controller for the other commands
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+from urllib.parse import urlparse
+
+from .emulator import serve
+from .pynuvo3 import get_async_nuvo, get_nuvo, profiler
+
+ZONES = '1-6'
+
+# Methods of the Nuvo interface a batch file may call
+BATCH_METHODS = (
+    'set_power', 'set_mute', 'set_volume', 'set_volume_up', 'set_volume_down',
+    'set_treble', 'set_bass', 'set_source', 'page', 'unpage',
+    'set_display_line', 'set_source_name', 'set_zone_name',
+)
+
+# Methods whose first argument is a zone list, i.e. 'page 1-3 6 40' or 'unpage 2'
+BATCH_ZONE_LIST_METHODS = ('page', 'unpage')
+
+DISPLAY_TIMEOUT = 30  # seconds a batch waits for queued keypad display text to be sent
+
+# Methods whose last argument is text, taken as the rest of the line -> number of arguments before it
+BATCH_TEXT_METHODS = {'set_display_line': 2, 'set_source_name': 1, 'set_zone_name': 1}
+
+
+def _parse_zones(value: str) -> list:
+    """
+    :param value: zone list, i.e. '1-6' or '1,3,5'
+    :return: list of zone numbers
+    """
+    zones = []
+    for part in value.split(','):
+        if '-' in part:
+            first, last = part.split('-', 1)
+            zones.extend(range(int(first), int(last) + 1))
+        else:
+            zones.append(int(part))
+    return zones
+
+
+def _parse_arg(value: str):
+    # on/off/true/false -> bool, digits -> int, anything else stays text, zone lists go through _parse_zones
+    if value.lower() in ('on', 'true'):
+        return True
+    if value.lower() in ('off', 'false'):
+        return False
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class Client(object):
+    """
+    Calls the sync or async Nuvo interface the same way
+    """
+    def __init__(self, port_url: str, use_async: bool):
+        self._loop = None
+        if use_async:
+            self._loop = asyncio.new_event_loop()
+            self.nuvo = self._loop.run_until_complete(get_async_nuvo(port_url, self._loop))
+        else:
+            self.nuvo = get_nuvo(port_url)
+
+    def call(self, method: str, *args):
+        result = getattr(self.nuvo, method)(*args)
+        if self._loop is not None and asyncio.iscoroutine(result):
+            result = self._loop.run_until_complete(result)
+        return result
+
+    def close(self):
+        if self._loop is None:
+            return
+        # a display worker left waiting would be destroyed pending with the loop
+        task = self.nuvo._display_task
+        if task is not None and not task.done():
+            task.cancel()
+            self._loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        transport = self.nuvo._protocol._transport
+        if transport is not None:
+            transport.close()
+            # lets the transport deliver connection_lost before the loop goes
+            self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
+
+
+def _status(client: Client, args) -> int:
+    for zone in _parse_zones(args.zones):
+        try:
+            status = client.call('zone_status', zone)
+        except Exception as err:
+            print('zone {}: error {}'.format(zone, err))
+            continue
+        if status is None:
+            print('zone {}: no valid response'.format(zone))
+            continue
+        line = 'zone {}: power={} source={} volume={} mute={}'.format(
+            zone, 'on' if status.power else 'off', status.source, status.volume, status.mute)
+        if args.settings:
+            settings = client.call('zone_settings', zone)
+            if settings is not None:
+                line += ' bass={} treble={}'.format(settings.bass, settings.treble)
+                line += ''.join(' {}={}'.format(name.lower(), value)
+                                for name, value in settings.extra.items())
+        print(line)
+    return 0
+
+
+def _batch(client: Client, args) -> int:
+    errors = 0
+    with open(args.file) as batch_file:
+        for number, line in enumerate(batch_file, 1):
+            text = line.split('#', 1)[0].strip()
+            words = text.split()
+            if not words:
+                continue
+            method = words[0]
+            if method in BATCH_TEXT_METHODS:
+                words = text.split(None, BATCH_TEXT_METHODS[method] + 1)
+                values = [_parse_arg(v) for v in words[1:-1]] + words[-1:]
+            else:
+                values = [_parse_arg(v) for v in words[1:]]
+            if method in BATCH_ZONE_LIST_METHODS and values:
+                values[0] = _parse_zones(words[1])
+            if method not in BATCH_METHODS:
+                print('line {}: unknown command {}'.format(number, method))
+                errors += 1
+                continue
+            try:
+                client.call(method, *values)
+            except Exception as err:
+                print('line {}: {} failed - {}'.format(number, method, err))
+                errors += 1
+    # display text is only queued, the sender thread dies with the process
+    if not client.call('wait_display', DISPLAY_TIMEOUT):
+        print('keypad display text not sent within {}s'.format(DISPLAY_TIMEOUT))
+        errors += 1
+    print('{} errors'.format(errors))
+    return 1 if errors else 0
+
+
+def _summary(name: str, values: list) -> str:
+    if not values:
+        return '{}: no samples'.format(name)
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return '{}: min {:.1f} mean {:.1f} median {:.1f} p95 {:.1f} max {:.1f} ms'.format(
+        name, values[0] * 1000, statistics.mean(values) * 1000,
+        statistics.median(values) * 1000, p95 * 1000, values[-1] * 1000)
+
+
+def _bench(client: Client, args) -> int:
+    zones = _parse_zones(args.zones)
+    if args.profile:
+        profiler.reset()
+        profiler.enable()
+    round_trips = []
+    sweeps = []
+    errors = 0
+    for _ in range(args.iterations):
+        sweep_start = time.perf_counter()
+        for zone in zones:
+            start = time.perf_counter()
+            try:
+                status = client.call('zone_status', zone)
+            except Exception:
+                status = None
+            if status is None:
+                errors += 1
+            else:
+                round_trips.append(time.perf_counter() - start)
+        sweeps.append(time.perf_counter() - sweep_start)
+
+    requests = args.iterations * len(zones)
+    print('{} requests, {} errors ({:.1%})'.format(requests, errors, errors / requests if requests else 0))
+    print(_summary('round trip', round_trips))
+    print(_summary('sweep of {} zones'.format(len(zones)), sweeps))
+    stats = client.nuvo.stats
+    if stats.total:
+        print('first try {:.1%}, retried {}, failed {}'.format(
+            stats.first_try_rate, stats.retried, stats.failed))
+    if args.profile:
+        profiler.disable()
+        profiler.dump(args.profile)
+        print('profile written to {}'.format(args.profile))
+    return 1 if errors else 0
+
+
+def _emulate(args) -> int:
+    url = urlparse(args.port)
+    if url.scheme != 'socket' or not url.port:
+        print('emulate needs a socket://host:port url to listen on')
+        return 1
+    try:
+        serve(url.port, url.hostname or 'localhost')
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='nuvo', description=__doc__.splitlines()[0])
+    parser.add_argument('port', help="serial port or url, i.e. /dev/ttyUSB0, socket://host:port")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='use the asyncio interface')
+    parser.add_argument('-v', '--verbose', action='store_true', help='debug logging')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    status = commands.add_parser('status', help='print the status of all zones')
+    status.add_argument('--zones', default=ZONES, help='zones to read, i.e. 1-6 or 1,3')
+    status.add_argument('--settings', action='store_true', help='also read tone settings')
+    status.set_defaults(func=_status)
+
+    batch = commands.add_parser('batch', help="run commands from a file, one per line, i.e. 'set_volume 1 40'")
+    batch.add_argument('file')
+    batch.set_defaults(func=_batch)
+
+    bench = commands.add_parser('bench', help='time status round trips and zone sweeps')
+    bench.add_argument('--zones', default=ZONES, help='zones to sweep, i.e. 1-6 or 1,3')
+    bench.add_argument('--iterations', type=int, default=20, help='number of sweeps')
+    bench.add_argument('--profile', metavar='FILE', help='write a per-phase trace to FILE')
+    bench.set_defaults(func=_bench)
+
+    emulate = commands.add_parser('emulate', help='serve an emulated controller on the socket:// url given as port')
+    emulate.set_defaults(func=None)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    if args.func is None:
+        return _emulate(args)
+    client = Client(args.port, args.use_async)
+    try:
+        return args.func(client, args)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Minimal Nuvo controller emulator, a stand-in for the serial port when no controller is at hand.
+
+Serves the Nuvo protocol over TCP, reach it with a socket:// port url, i.e.
+    python -m nuvo socket://localhost:4999 emulate
+    python -m nuvo socket://localhost:4999 bench
+"""
+
+import logging
+import re
+import socketserver
+
+_LOGGER = logging.getLogger(__name__)
+
+ZONES = 6
+
+REQUEST_PATTERN = re.compile(r'^Z(?P<zone>\d+)(?P<command>[A-Z?]+)(?P<value>[+-]?\d*)$')
+
+
+class ZoneState(object):
+    def __init__(self, zone: int):
+        self.zone = zone
+        self.power = False
+        self.source = 1
+        self.volume = 40
+        self.mute = False
+        self.bass = 0
+        self.treble = 0
+
+    def status(self) -> str:
+        # #Zx,ON,SRCs,VOLyy,DNDd,LOCKl, see pynuvo3
+        if not self.power:
+            return '#Z{},OFF'.format(self.zone)
+        volume = 'MUTE' if self.mute else 'VOL{:0=2}'.format(self.volume)
+        return '#Z{},ON,SRC{},{},DND0,LOCK0'.format(self.zone, self.source, volume)
+
+    def settings(self) -> str:
+        # #Zx,ORp,BASSyy,TREByy,GRPq,VRSTr
+        return '#Z{},OR0,BASS{:+03d},TREB{:+03d},GRP0,VRST0'.format(self.zone, self.bass, self.treble)
+
+
+class NuvoEmulator(object):
+    """
+    Keeps the state of every zone and answers requests the way the controller does
+    """
+    def __init__(self, zones: int = ZONES):
+        self.zones = {zone: ZoneState(zone) for zone in range(1, zones + 1)}
+
+    def handle(self, request: str) -> str:
+        """
+        :param request: request without the leading * and trailing <CR>, i.e. 'Z1STATUS?'
+        :return: response without the trailing <CR><LF>
+        """
+        match = REQUEST_PATTERN.match(request)
+        if not match or int(match.group('zone')) not in self.zones:
+            # display lines, names and anything unknown are acknowledged
+            return '#OK' if request.startswith(('S', 'ZCFG', 'SCFG')) else '#?'
+        zone = self.zones[int(match.group('zone'))]
+        command, value = match.group('command'), match.group('value')
+        if command == 'SETSR':
+            return zone.settings()
+        if command == 'ON':
+            zone.power = True
+        elif command == 'OFF':
+            zone.power = False
+        elif command == 'MUTE':
+            zone.mute = True
+        elif command == 'MUTEOFF':
+            zone.mute = False
+        elif command == 'SRC' and value:
+            zone.source = int(value)
+        elif command == 'VOL' and value in ('+', '-'):
+            zone.volume = max(0, min(zone.volume + (-1 if value == '+' else 1), 79))  # 0=Max
+        elif command == 'VOL' and value:
+            zone.volume = int(value)
+            zone.mute = False
+        elif command == 'TREB' and value:
+            zone.treble = int(value)
+        elif command == 'BASS' and value:
+            zone.bass = int(value)
+        elif command != 'STATUS?':
+            return '#?'
+        return zone.status()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        buffer = b''
+        while True:
+            data = self.request.recv(256)
+            if not data:
+                return
+            buffer += data
+            while b'\r' in buffer:
+                line, buffer = buffer.split(b'\r', 1)
+                request = line.decode('ascii', 'replace').lstrip('*').strip()
+                if not request:
+                    continue
+                response = self.server.emulator.handle(request)
+                _LOGGER.debug('%s -> %s', request, response)
+                self.request.sendall(response.encode('ascii') + b'\r\n')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def serve(port: int, host: str = 'localhost', emulator: NuvoEmulator = None):
+    """
+    Serve the emulator over TCP until interrupted
+    :param port: TCP port to listen on
+    :param host: address to listen on
+    """
+    with _Server((host, port), _Handler) as server:
+        server.emulator = emulator or NuvoEmulator()
+        _LOGGER.info('Nuvo emulator listening on %s:%d', host, port)
+        server.serve_forever()
@@ -1,14 +1,16 @@
 """Support for interfacing with Nuvo Multi-Zone Amplifier via serial/RS-232."""
 
 import logging
+from datetime import timedelta
 import voluptuous as vol
 
 from serial import SerialException
-from .pynuvo3 import get_nuvo
+from .pynuvo3 import SETTINGS_TTL, get_nuvo, profiler
 
 from homeassistant import core
 from homeassistant.components.media_player import PLATFORM_SCHEMA, MediaPlayerEntity
 from homeassistant.components.media_player.const import (
+    ATTR_MEDIA_VOLUME_LEVEL,
     DOMAIN,
     SUPPORT_SELECT_SOURCE,
     SUPPORT_TURN_OFF,
@@ -26,6 +28,7 @@ from homeassistant.const import (
     STATE_ON,
 )
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import track_time_interval
 
 # from .const import (
 #     CONF_SOURCES,
@@ -59,14 +62,61 @@ CONF_SOURCES = "sources"
 CONF_MODEL = "essentia"
 DATA_NUVO = "nuvo"
 ATTR_SOURCE = "source"
+ATTR_TREBLE = "treble"
+ATTR_BASS = "bass"
 SERVICE_SNAPSHOT = 'snapshot'
 SERVICE_RESTORE = 'restore'
 SERVICE_SETALLZONES = "set_all_zones"
+SERVICE_PAGE = "page"
+SERVICE_UNPAGE = "unpage"
+SERVICE_DISPLAY = "display"
+SERVICE_PROFILE = "profile"
+SERVICE_PROFILE_DUMP = "profile_dump"
+ATTR_LINE = "line"
+ATTR_MESSAGE = "message"
+ATTR_ENABLED = "enabled"
+ATTR_SAMPLE_RATE = "sample_rate"
+ATTR_FILENAME = "filename"
+PROFILE_FILENAME = "nuvo_profile.json"
+
+# Tone settings are polled on their own, much slower, schedule than power/source/volume
+SETTINGS_SCAN_INTERVAL = timedelta(seconds=60)
 
 NUVO_SETALLZONES_SCHEMA = MEDIA_PLAYER_SCHEMA.extend(
     {vol.Required(ATTR_SOURCE): cv.string}
 )
 
+NUVO_PAGE_SCHEMA = MEDIA_PLAYER_SCHEMA.extend(
+    {
+        vol.Required(ATTR_SOURCE): cv.string,
+        vol.Required(ATTR_MEDIA_VOLUME_LEVEL): cv.small_float,
+    }
+)
+
+NUVO_DISPLAY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_SOURCE): cv.string,
+        vol.Required(ATTR_LINE): vol.All(vol.Coerce(int), vol.Range(min=1, max=4)),
+        vol.Required(ATTR_MESSAGE): cv.string,
+    }
+)
+
+NUVO_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENABLED): cv.boolean,
+        vol.Optional(ATTR_SAMPLE_RATE, default=1): cv.positive_int,
+    }
+)
+
+# a plain file name, always written to the config dir
+NUVO_PROFILE_DUMP_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_FILENAME, default=PROFILE_FILENAME): vol.All(
+            cv.string, vol.Match(r"^[\w.-]+$"), vol.NotIn([".", ".."])
+        )
+    }
+)
+
 # Valid zone ids: 1-6
 ZONE_IDS = vol.All(vol.Coerce(int), vol.Range(min=1, max=6))
 
@@ -114,8 +164,27 @@ def setup_platform(hass, config, add_entities, discovery_info=None):
         hass.data[DATA_NUVO][unique_id] = device
         devices.append(device)
 
+    def refresh_settings(now=None):
+        """Refresh the tone settings of zones whose cached settings expire before the next run."""
+        max_age = SETTINGS_TTL - SETTINGS_SCAN_INTERVAL.total_seconds()
+        for zone_id in config[CONF_ZONES]:
+            try:
+                nuvo.zone_settings(zone_id, max_age=max_age)
+            except SerialException:
+                _LOGGER.warning("Could not update settings of zone %d", zone_id)
+
+    # fill the cache before the first update, so the attributes are there from the start
+    refresh_settings()
     add_entities(devices, True)
 
+    # show the configured names on the keypads, queued below control commands
+    for source_id, name in sources.items():
+        nuvo.set_source_name(source_id, name)
+    for zone_id, extra in config[CONF_ZONES].items():
+        nuvo.set_zone_name(zone_id, extra[CONF_NAME])
+
+    track_time_interval(hass, refresh_settings, SETTINGS_SCAN_INTERVAL)
+
     def service_handle(service):
         """Handle for services."""
         entity_ids = service.data.get(ATTR_ENTITY_ID)
@@ -130,13 +199,69 @@ def setup_platform(hass, config, add_entities, discovery_info=None):
         else:
             devices = hass.data[DATA_NUVO].values()
 
+        if service.service == SERVICE_PAGE:
+            if source not in sources.values():
+                _LOGGER.error("Unknown paging source %s", source)
+                return
+            source_id = next(k for k, v in sources.items() if v == source)
+            volume = int(79 - service.data[ATTR_MEDIA_VOLUME_LEVEL] * 79)
+            # all zones are switched in one go, without a round trip per entity call
+            nuvo.page([device.zone_id for device in devices], source_id, volume)
+        elif service.service == SERVICE_UNPAGE:
+            nuvo.unpage([device.zone_id for device in devices])
+
         for device in devices:
             if service.service == SERVICE_SETALLZONES:
                 device.set_all_zones(source)
+            elif service.service in (SERVICE_PAGE, SERVICE_UNPAGE):
+                device.schedule_update_ha_state(True)
 
     hass.services.register(
         DOMAIN, SERVICE_SETALLZONES, service_handle, schema=NUVO_SETALLZONES_SCHEMA
     )
+    hass.services.register(
+        DOMAIN, SERVICE_PAGE, service_handle, schema=NUVO_PAGE_SCHEMA
+    )
+    hass.services.register(
+        DOMAIN, SERVICE_UNPAGE, service_handle, schema=MEDIA_PLAYER_SCHEMA
+    )
+
+    def display_handle(service):
+        """Handle for the keypad display service."""
+        source = service.data[ATTR_SOURCE]
+        if source not in sources.values():
+            _LOGGER.error("Unknown display source %s", source)
+            return
+        source_id = next(k for k, v in sources.items() if v == source)
+        # queued below control commands, unchanged lines are not sent again
+        nuvo.set_display_line(source_id, service.data[ATTR_LINE], service.data[ATTR_MESSAGE])
+
+    hass.services.register(
+        DOMAIN, SERVICE_DISPLAY, display_handle, schema=NUVO_DISPLAY_SCHEMA
+    )
+
+    def profile_handle(service):
+        """Handle for the profiling services."""
+        if service.service == SERVICE_PROFILE:
+            if service.data[ATTR_ENABLED]:
+                profiler.reset()
+                profiler.enable(service.data[ATTR_SAMPLE_RATE])
+            else:
+                profiler.disable()
+        elif service.service == SERVICE_PROFILE_DUMP:
+            path = hass.config.path(service.data[ATTR_FILENAME])
+            profiler.dump(path)
+            _LOGGER.info("Nuvo profile written to %s: %s", path, profiler.as_dict())
+            # first try / retry success rates of the shared serial link, logged here
+            # rather than as an attribute that changes on every poll of every zone
+            _LOGGER.info("Nuvo link stats: %s", nuvo.stats.as_dict())
+
+    hass.services.register(
+        DOMAIN, SERVICE_PROFILE, profile_handle, schema=NUVO_PROFILE_SCHEMA
+    )
+    hass.services.register(
+        DOMAIN, SERVICE_PROFILE_DUMP, profile_handle, schema=NUVO_PROFILE_DUMP_SCHEMA
+    )
 
 
 class NuvoZone(MediaPlayerEntity):
@@ -161,21 +286,43 @@ class NuvoZone(MediaPlayerEntity):
         self._volume = None
         self._source = None
         self._mute = None
+        self._settings = None
+        self._version = None
         self._update_success = True
 
     def update(self):
         """Retrieve latest state."""
+        start = profiler.start('update')
         try:
-            state = self._nuvo.zone_status(self._zone_id)
+            return self._update()
+        finally:
+            if start is not None:
+                profiler.record('update', start)
+
+    def _update(self):
+        """Poll the zone status and read the cached tone settings."""
+        try:
+            # falls back to the last known status while another call holds the port
+            cached = self._nuvo.try_zone_status(self._zone_id)
         except SerialException:
             self._update_success = False
             _LOGGER.warning("Could not update zone %d", self._zone_id)
             return
         
-        if not state:
+        if not cached:
             self._update_success = False
             return
-        
+        if cached.stale:
+            # the port has been busy for too long, don't present old state as current
+            self._update_success = False
+            _LOGGER.warning("Zone %d status is %.0fs old, port busy", self._zone_id, cached.age)
+            return
+        if cached.version == self._version:
+            _LOGGER.debug("Zone %d served from cache, status is %.1fs old", self._zone_id, cached.age)
+        self._update_success = True
+        self._version = cached.version
+
+        state = cached.status
         self._state = STATE_ON if state.power else STATE_OFF
         self._volume = state.volume
         self._mute = state.mute
@@ -184,6 +331,8 @@ class NuvoZone(MediaPlayerEntity):
             self._source = self._source_id_name[idx]
         else:
             self._source = None
+        # tone settings come from the cache only, refresh_settings keeps it filled
+        self._settings = self._nuvo.cached_zone_settings(self._zone_id)
         return True
 
     @property
@@ -201,6 +350,11 @@ class NuvoZone(MediaPlayerEntity):
             "model": "Essentia",
         }
 
+    @property
+    def zone_id(self):
+        """Return the Nuvo zone number."""
+        return self._zone_id
+
     @property
     def unique_id(self):
         """Return unique ID for this device."""
@@ -211,6 +365,11 @@ class NuvoZone(MediaPlayerEntity):
         """Return the name of the zone."""
         return self._name
 
+    @property
+    def available(self):
+        """Return False while the zone can't be read or its status is stale."""
+        return self._update_success
+
     @property
     def state(self):
         """Return the state of the zone."""
@@ -228,6 +387,16 @@ class NuvoZone(MediaPlayerEntity):
         """Boolean if volume is currently muted."""
         return self._mute
 
+    @property
+    def extra_state_attributes(self):
+        """Return the tone and extended settings of the zone."""
+        if self._settings is None:
+            return None
+        attributes = {ATTR_TREBLE: self._settings.treble, ATTR_BASS: self._settings.bass}
+        for name, value in self._settings.extra.items():
+            attributes[name.lower()] = value
+        return attributes
+
     @property
     def supported_features(self):
         """Return flag of media commands that are supported."""
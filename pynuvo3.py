@@ -1,10 +1,15 @@
 #Modified pynuvo (Ileo19 fork) from pymonoprice
 
 import asyncio
+import collections
+import copy
 import functools
+import itertools
+import json
 import logging
 import re
 import serial
+import threading
 import time  # Need this for synchornized
 import string  # is this necessary? not in pyblackbird
 import io  # is this necessary? not in pyblackbird
@@ -41,14 +46,50 @@ GRAND_CONCERTO_MUTE_PATTERN = re.compile('#Z(?P<zone>\d),'
                      'DND(?P<dnd>\d),'
                      'LOCK(?P<lock>\d)')
 
+'''
+#Zx,ORp,BASSyy,TREByy,GRPq,VRSTr<CR><LF>
+Only bass and treble are required, any other NAMEnn field is kept as an extra setting
+'''
+ZONE_SETTINGS_PATTERN = re.compile('#Z(?P<zone>\d+),'
+                     '.*BASS(?P<bass>[+-]?\d+),'
+                     'TREB(?P<treble>[+-]?\d+)')
+
+ZONE_SETTINGS_FIELD_PATTERN = re.compile('(?P<name>[A-Z]+)(?P<value>[+-]?\d+)$')
+
+'''
+Commands that leave the zone in the same state no matter how often they are sent,
+so they can be repeated after a timeout. Relative commands (VOL+, VOL-) are not in here,
+the first try may have reached the Nuvo even though the response was lost.
+Keypad display text (DISPLINE, NAME) is absolute as well.
+'''
+IDEMPOTENT_REQUEST_PATTERN = re.compile('^(Z\d+'
+                     '(STATUS\?|SETSR|ON|OFF|MUTE|MUTEOFF|VOL\d\d|SRC\d|TREB-?\d+|BASS-?\d+)'
+                     '|S\d+DISPLINE\d"[^"]*"'
+                     '|(S|Z)CFG\d+NAME"[^"]*")$')
+
 
 
 EOL = b'\r\n'
 LEN_EOL = len(EOL)  # not in original pynuvo, but needed for async
 TIMEOUT_OP       = 0.2   # Number of seconds before serial operation timeout, this is sig shorter than in blackbird which is 2.0
 TIMEOUT_RESPONSE = 2.5   # Number of seconds before command response timeout
+RETRY_ATTEMPTS   = 3     # Maximum number of tries for an idempotent command
+RETRY_BUDGET     = 0.7   # Number of seconds a command and all its retries may take in total, RETRY_ATTEMPTS timeouts fit
+STATUS_STALE     = 60    # Number of seconds after which a cached zone status counts as stale
+SETTINGS_TTL     = 300   # Number of seconds a zone's tone/extended settings are served from cache
+PROFILE_EVENTS   = 10000 # Number of sampled timings kept for a trace dump
+DISPLAY_LINES    = 4     # Number of text lines on a keypad display
+DISPLAY_WIDTH    = 20    # Number of characters sent per display line or name
+DISPLAY_INTERVAL = 0.05  # Number of seconds between keypad display commands, keeps the link free for control
+DISPLAY_RETRY    = 5     # Number of seconds before a keypad display command that failed is sent again
 VOLUME_DEFAULT  = 79    # Value used when zone is muted or otherwise unable to get volume integer
 
+class ResponseError(serial.SerialException):
+    """
+    Response from the Nuvo that is not ascii or does not parse, i.e. noise on the line
+    """
+
+
 class ZoneStatus(object):     # #Z1,ON,SRC4,VOL60,DND0,LOCK0 – POWER ON (page 7 of NUVO Protocol.pdf)
     def __init__(self
                  ,zone: int
@@ -70,16 +111,14 @@ class ZoneStatus(object):     # #Z1,ON,SRC4,VOL60,DND0,LOCK0 – POWER ON (page
         else:
            self.power = bool(0)
 #        self.sourcename = ''
-#        self.treble = treble
-#        self.bass = bass
+        self.treble = None  # filled in from the settings cache, see ZoneSettings
+        self.bass = None
         if 'MUTE' in volume:
            self.mute = bool(1)
            self.volume = int(VOLUME_DEFAULT)
         else:
            self.mute = bool(0)
            self.volume = int(volume)
-#        self.treble = 0
-#        self.bass = 0
 
     @classmethod
     def from_string(cls, string: bytes):
@@ -87,8 +126,11 @@ class ZoneStatus(object):     # #Z1,ON,SRC4,VOL60,DND0,LOCK0 – POWER ON (page
             return None
         _LOGGER.debug('string passed to ZoneStatus.from_string - %s' , string)
 
+        start = profiler.start('parse')
         match = _parse_response(string)
-        
+        if start is not None:
+            profiler.record('parse', start)
+
         if not match:
             return None
 
@@ -102,6 +144,348 @@ class ZoneStatus(object):     # #Z1,ON,SRC4,VOL60,DND0,LOCK0 – POWER ON (page
         return rtn
 
 
+class ZoneSettings(object):   # #Z1,OR0,BASS-04,TREB+02,GRP0,VRST0 – zone settings status
+    def __init__(self
+                 ,zone: int
+                 ,bass: int    # -12 to 12
+                 ,treble: int  # -12 to 12
+                 ,extra: dict = None  # any other setting returned, i.e. {'GRP': 0, 'VRST': 0}
+                 ):
+        self.zone = int(zone)
+        self.bass = int(bass)
+        self.treble = int(treble)
+        self.extra = extra or {}
+
+    @classmethod
+    def from_string(cls, string: str):
+        if not string:
+            return None
+        _LOGGER.debug('string passed to ZoneSettings.from_string - %s' , string)
+
+        match = re.search(ZONE_SETTINGS_PATTERN, string)
+        if not match:
+            _LOGGER.debug('NO MATCH - %s' , string)
+            return None
+
+        extra = {}
+        for field in string.strip().split(',')[1:]:
+            field_match = ZONE_SETTINGS_FIELD_PATTERN.match(field)
+            if field_match and field_match.group('name') not in ('BASS', 'TREB'):
+                extra[field_match.group('name')] = int(field_match.group('value'))
+        return ZoneSettings(match.group('zone'), match.group('bass'), match.group('treble'), extra)
+
+
+class SettingsCache(object):
+    """
+    Zone settings by zone, each kept for SETTINGS_TTL seconds. Tone values written to a zone are put in as well
+    """
+    def __init__(self, ttl: float = SETTINGS_TTL):
+        self._ttl = ttl
+        self._settings = {}  # zone -> (time.monotonic() when read, ZoneSettings)
+
+    def get(self, zone: int, max_age: float = None):
+        """
+        :param zone: zone 1.12
+        :param max_age: seconds the entry may be old, defaults to the cache TTL
+        :return: cached settings of the zone or None when missing or too old
+        """
+        entry = self._settings.get(int(zone))
+        if entry is None:
+            return None
+        if max_age is None:
+            max_age = self._ttl
+        if time.monotonic() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def last(self, zone: int):
+        """
+        :param zone: zone 1.12
+        :return: last settings read for the zone however old, None if never read
+        """
+        entry = self._settings.get(int(zone))
+        return entry[1] if entry is not None else None
+
+    def put(self, settings: ZoneSettings):
+        self._settings[settings.zone] = (time.monotonic(), settings)
+
+    def write(self, zone: int, treble: int = None, bass: int = None):
+        """
+        Put tone values sent to the zone into its cached settings, so last() stays in step with the Nuvo.
+        The entry keeps the time it was read, the next refresh still reads the zone back
+        """
+        entry = self._settings.get(int(zone))
+        if entry is None:
+            return
+        read, settings = entry
+        self._settings[int(zone)] = (read, ZoneSettings(
+            settings.zone,
+            settings.bass if bass is None else _clamp_tone(bass),
+            settings.treble if treble is None else _clamp_tone(treble),
+            settings.extra))
+
+    def apply(self, status: ZoneStatus):
+        """
+        Copy the cached tone settings into a zone status, so it can be restored later
+        """
+        settings = self.last(status.zone)
+        if settings is not None:
+            status.treble = settings.treble
+            status.bass = settings.bass
+        return status
+
+
+class RequestStats(object):
+    """
+    Outcome counters for requests sent to the Nuvo, to see how noisy the serial link is
+    """
+    def __init__(self):
+        self.first_try = 0   # requests answered on the first try
+        self.retried = 0     # requests answered after one or more retries
+        self.failed = 0      # requests that gave up
+        self.retries = 0     # total number of extra tries sent
+
+    def record(self, attempts: int, success: bool):
+        self.retries += attempts - 1
+        if not success:
+            self.failed += 1
+        elif attempts == 1:
+            self.first_try += 1
+        else:
+            self.retried += 1
+
+    @property
+    def total(self):
+        return self.first_try + self.retried + self.failed
+
+    @property
+    def first_try_rate(self):
+        """Fraction of all requests answered on the first try"""
+        if not self.total:
+            return None
+        return self.first_try / self.total
+
+    @property
+    def retry_success_rate(self):
+        """Fraction of the requests that needed a retry and were answered in the end"""
+        if not self.retried + self.failed:
+            return None
+        return self.retried / (self.retried + self.failed)
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'first_try': self.first_try,
+            'retried': self.retried,
+            'failed': self.failed,
+            'retries': self.retries,
+            'first_try_rate': self.first_try_rate,
+            'retry_success_rate': self.retry_success_rate,
+        }
+
+
+class CachedZoneStatus(collections.namedtuple('CachedZoneStatus', ['status', 'updated', 'version'])):
+    """
+    A ZoneStatus from the store, with the time.time() it was read and the store version it was written at
+    """
+    __slots__ = ()
+
+    @property
+    def age(self):
+        """Seconds since the status was read from the Nuvo"""
+        return time.time() - self.updated
+
+    @property
+    def stale(self):
+        """True once the status is older than STATUS_STALE"""
+        return self.age > STATUS_STALE
+
+
+class ZoneStateStore(object):
+    """
+    Last known ZoneStatus of every zone. Reading never waits for the serial port,
+    the value may be stale, check its age or version
+    """
+    def __init__(self):
+        self._lock = threading.Lock()  # only guards the version counter, never held during I/O
+        self._entries = {}   # zone -> CachedZoneStatus
+        self._version = 0
+
+    @property
+    def version(self):
+        """Incremented on every write, unchanged version means nothing new"""
+        return self._version
+
+    def get(self, zone: int):
+        """
+        :param zone: zone 1.12
+        :return: CachedZoneStatus of the zone or None if it was never read
+        """
+        return self._entries.get(int(zone))
+
+    def put(self, status: ZoneStatus, updated: float = None):
+        """
+        :param status: status read from the Nuvo
+        :param updated: time.time() the status was read, defaults to now
+        :return: the stored CachedZoneStatus
+        """
+        if updated is None:
+            updated = time.time()
+        with self._lock:
+            self._version += 1
+            entry = CachedZoneStatus(status, updated, self._version)
+            self._entries[int(status.zone)] = entry
+        return entry
+
+
+class Profiler(object):
+    """
+    Per-phase timings of the hot paths: lock_wait, write, first_byte, byte_loop, parse and update.
+    Off by default, then every hook costs one attribute check.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1   # time 1 in sample_rate calls of each phase
+        self._calls = {}       # phase -> itertools.count of calls, next() on it is atomic
+        self._lock = threading.Lock()
+        self._phases = {}      # phase -> [count, total seconds, max seconds]
+        self._events = collections.deque(maxlen=PROFILE_EVENTS)  # (phase, thread, start, duration)
+
+    def enable(self, sample_rate: int = 1):
+        self.sample_rate = max(1, int(sample_rate))
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._phases = {}
+            self._calls = {}
+            self._events.clear()
+
+    def start(self, phase: str):
+        """
+        :param phase: first phase timed from here, sampling is counted per phase
+        :return: time.perf_counter() when this call is to be timed, otherwise None
+        """
+        if not self.enabled:
+            return None
+        if self.sample_rate > 1:
+            calls = self._calls.get(phase) or self._calls.setdefault(phase, itertools.count(1))
+            if next(calls) % self.sample_rate:
+                return None
+        return time.perf_counter()
+
+    def record(self, phase: str, start: float):
+        """
+        :param phase: name of the phase that ran from start until now
+        :param start: value returned by start(), or by the record() of the phase before
+        :return: time.perf_counter() at the end of the phase, to start the next phase from
+        """
+        end = time.perf_counter()
+        duration = end - start
+        with self._lock:
+            stat = self._phases.setdefault(phase, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] = max(stat[2], duration)
+            self._events.append((phase, threading.get_ident(), start, duration))
+        return end
+
+    def as_dict(self):
+        """
+        :return: {phase: {count, total_ms, mean_ms, max_ms}}
+        """
+        with self._lock:
+            return {phase: {'count': count,
+                            'total_ms': total * 1000,
+                            'mean_ms': total * 1000 / count,
+                            'max_ms': longest * 1000}
+                    for phase, (count, total, longest) in self._phases.items()}
+
+    def dump(self, path: str):
+        """
+        Write the sampled timings as a Chrome trace event file, readable by chrome://tracing,
+        Perfetto or speedscope, with the per-phase summary under otherData
+        :param path: file to write
+        """
+        with self._lock:
+            events = [{'name': phase, 'cat': 'nuvo', 'ph': 'X', 'pid': 0, 'tid': thread,
+                       'ts': start * 1e6, 'dur': duration * 1e6}
+                      for phase, thread, start, duration in self._events]
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'otherData': self.as_dict()}, trace_file)
+
+
+profiler = Profiler()
+
+
+class DisplayQueue(object):
+    """
+    Keypad display text waiting to be sent. Tracks what every keypad field already shows,
+    so only changed fields are queued, and a newer text replaces an unsent older one
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shown = {}    # field -> request last sent
+        self._inflight = {} # field -> request popped and being sent
+        self._pending = collections.OrderedDict()  # field -> request to send
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def idle(self):
+        """True when nothing is queued or being sent"""
+        with self._lock:
+            return not self._pending and not self._inflight
+
+    def update(self, field, request: str) -> bool:
+        """
+        :param field: key of the keypad field, i.e. ('line', source, line)
+        :param request: request that puts the text on the field
+        :return: True if the request was queued, False if the field already shows it
+        """
+        with self._lock:
+            # while a request is being sent the field will show that one, not _shown
+            showing = self._inflight.get(field, self._shown.get(field))
+            if showing == request:
+                self._pending.pop(field, None)
+                return False
+            self._pending[field] = request
+            return True
+
+    def pop(self):
+        """
+        :return: (field, request) that has waited longest, or None
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+            field, request = self._pending.popitem(last=False)
+            self._inflight[field] = request
+            return field, request
+
+    def sent(self, field, request: str):
+        with self._lock:
+            self._inflight.pop(field, None)
+            self._shown[field] = request
+
+    def failed(self, field, request: str):
+        # send it again later, unless newer text was queued meanwhile
+        with self._lock:
+            self._inflight.pop(field, None)
+            self._pending.setdefault(field, request)
+
+    def forget(self):
+        """
+        Assume nothing is shown, i.e. after the controller restarted
+        """
+        with self._lock:
+            self._shown.clear()
+
+
 class Nuvo(object):
     """
     Nuvo amplifier interface
@@ -115,6 +499,32 @@ class Nuvo(object):
         """
         raise NotImplemented()
 
+    def cached_zone_status(self, zone: int):
+        """
+        Get the last known status of the zone without waiting for the serial port
+        :param zone: zone 1.12
+        :return: CachedZoneStatus of the zone or None if it was never read
+        """
+        raise NotImplemented()
+
+    def try_zone_status(self, zone: int):
+        """
+        Read the zone status if the serial port is free, otherwise fall back to the last known one
+        :param zone: zone 1.12
+        :return: CachedZoneStatus of the zone, from the cache only while the port is busy (check stale),
+                 None if the port was free but the read failed or the zone was never read
+        """
+        raise NotImplemented()
+
+    def zone_settings(self, zone: int, max_age: float = None):
+        """
+        Get the tone and extended settings of the zone, served from cache when fresh enough
+        :param zone: zone 1.12
+        :param max_age: seconds a cached value may be old, defaults to SETTINGS_TTL
+        :return: settings of the zone or None
+        """
+        raise NotImplemented()
+
     def set_power(self, zone: int, power: bool):
         """
         Turn zone on or off
@@ -164,7 +574,7 @@ class Nuvo(object):
         """
         Set treble for zone
         :param zone: zone 1.12        
-        :param treble: float from -18 to 18 inclusive
+        :param treble: integer from -12 to 12 inclusive
         """
         raise NotImplemented()
 
@@ -172,7 +582,7 @@ class Nuvo(object):
         """
         Set bass for zone
         :param zone: zone 1.12        
-        :param bass: float from -18 to 18 inclusive 
+        :param bass: integer from -12 to 12 inclusive
         """
         raise NotImplemented()
 
@@ -191,6 +601,55 @@ class Nuvo(object):
         """
         raise NotImplemented()
 
+    def page(self, zones, source: int, volume: int):
+        """
+        Switch zones to the paging source at a set volume, remembering their state
+        :param zones: zones 1.12 to page
+        :param source: paging source, integer from 1 to 6 inclusive
+        :param volume: integer from 0 to 79 inclusive
+        """
+        raise NotImplemented()
+
+    def unpage(self, zones=None):
+        """
+        Put the zones switched by page() back to the state they had before
+        :param zones: zones 1.12 to put back, defaults to all paged zones
+        """
+        raise NotImplemented()
+
+    def set_display_line(self, source: int, line: int, text: str):
+        """
+        Show text on a keypad display line for a source. Queued, returns before it is sent
+        :param source: integer from 1 to 6 inclusive
+        :param line: integer from 1 to 4 inclusive
+        :param text: text to show, cut to DISPLAY_WIDTH characters
+        """
+        raise NotImplemented()
+
+    def set_source_name(self, source: int, name: str):
+        """
+        Set the source name shown on the keypads. Queued, returns before it is sent
+        :param source: integer from 1 to 6 inclusive
+        :param name: name to show, cut to DISPLAY_WIDTH characters
+        """
+        raise NotImplemented()
+
+    def set_zone_name(self, zone: int, name: str):
+        """
+        Set the zone name shown on the keypads. Queued, returns before it is sent
+        :param zone: zone 1.12
+        :param name: name to show, cut to DISPLAY_WIDTH characters
+        """
+        raise NotImplemented()
+
+    def wait_display(self, timeout: float = None):
+        """
+        Wait until all queued keypad display text is sent
+        :param timeout: seconds to wait at most, None waits for ever
+        :return: True when the queue drained, False on timeout
+        """
+        raise NotImplemented()
+
 
 # Helpers
 
@@ -227,9 +686,102 @@ def _parse_response(string: bytes):
        _LOGGER.debug('NO MATCH - %s' , string)
    return None
 
+def _is_idempotent(request: str) -> bool:
+    return IDEMPOTENT_REQUEST_PATTERN.match(request) is not None
+
+def _may_retry(request: str, attempt: int, deadline: float) -> bool:
+    """
+    :param request: request that timed out or got a garbled response
+    :param attempt: number of tries made so far
+    :param deadline: time.monotonic() at which RETRY_BUDGET is used up
+    :return: True if there is another try left for the request within RETRY_BUDGET
+    """
+    if attempt >= RETRY_ATTEMPTS or not _is_idempotent(request):
+        return False
+    return time.monotonic() + TIMEOUT_OP <= deadline
+
+def _decode_response(request: str, response: bytes, parse=None):
+    """
+    :param request: request the response belongs to
+    :param response: bytes received from the Nuvo
+    :param parse: optional function turning the ascii response into an object, None when it does not match
+    :return: ascii string, or what parse returned
+    """
+    try:
+        ret = response.decode('ascii')
+    except UnicodeDecodeError:
+        raise ResponseError('Garbled response to "{}": {}'.format(request, response))
+    if parse is None:
+        return ret
+    parsed = parse(ret)
+    if parsed is None:
+        raise ResponseError('Unexpected response to "{}": {}'.format(request, response))
+    return parsed
+
+def _paged_status(zone: int, source: int, volume: int) -> ZoneStatus:
+    """
+    :return: the state page() leaves a zone in
+    """
+    return ZoneStatus(str(zone), 'ON', str(source), '{:0=2}'.format(volume))
+
+def _page_requests(status: ZoneStatus, source: int, volume: int) -> list:
+    """
+    :param status: current state of the zone
+    :return: the fewest requests that switch the zone to source at volume
+    """
+    zone = int(status.zone)
+    requests = []
+    if not status.power:
+        requests.append(_format_set_power(zone, True))
+    if int(status.source) != source:
+        requests.append(_format_set_source(zone, source))
+    if status.mute:
+        requests.append(_format_set_mute(zone, False))
+    if status.mute or status.volume != volume:
+        requests.append(_format_set_volume(zone, volume))
+    return requests
+
+def _paged_before(status: ZoneStatus, woken: ZoneStatus = None, muted: bool = False) -> ZoneStatus:
+    """
+    The OFF and MUTE status carry no source or volume, the replies to ON and MUTEOFF do
+    :param status: OFF or MUTE state of the zone before paging
+    :param woken: status the Nuvo replied with once the zone was on and unmuted, None before that
+    :param muted: True if the zone came up muted when it was turned on
+    :return: the state for unpage() to put back, source and volume None while not known
+    """
+    before = copy.copy(status)
+    before.source = woken.source if woken is not None else None
+    before.volume = woken.volume if woken is not None else None
+    before.mute = status.mute or muted
+    return before
+
+def _unpage_requests(status: ZoneStatus, source: int, volume: int) -> list:
+    """
+    :param status: state of the zone before paging, see _paged_before for zones that were off or muted
+    :return: the fewest requests that put the zone back from source at volume to status
+    """
+    zone = int(status.zone)
+    requests = []
+    # source and volume first, so they are what the zone plays once it is turned on or unmuted again
+    if status.source is not None and int(status.source) != source:
+        requests.append(_format_set_source(zone, status.source))
+    if status.volume is not None and status.volume != volume:
+        requests.append(_format_set_volume(zone, status.volume))
+    if status.mute:
+        requests.append(_format_set_mute(zone, True))
+    if not status.power:
+        requests.append(_format_set_power(zone, False))
+    return requests
+
+def _format_request(request: str) -> bytes:
+    return ('*' + request + '\r').encode()
+
 def _format_zone_status_request(zone: int) -> str:
     return 'Z{}STATUS?'.format(zone)
 
+def _format_zone_settings_request(zone: int) -> str:
+    return 'Z{}SETSR'.format(int(zone))
+
 def _format_set_power(zone: int, power: bool) -> str:
     zone = int(zone)
     if (power):
@@ -255,18 +807,39 @@ def _format_set_volume_down(zone: int) -> str:
     #CMD *ZzVOL-   where "z" is the Zone number
     return 'Z{}VOL-'.format(int(zone))
 
-def _format_set_treble(zone: int, treble: int) -> bytes:
-    treble = int(max(12, min(treble, -12)))
+def _clamp_tone(value: int) -> int:
+    return int(max(-12, min(int(value), 12)))
+
+def _format_set_treble(zone: int, treble: int) -> str:
+    treble = _clamp_tone(treble)
     return 'Z{}TREB{:0=2}'.format(int(zone),treble)
 
-def _format_set_bass(zone: int, bass: int) -> bytes:
-    bass = int(max(12, min(bass, -12)))
+def _format_set_bass(zone: int, bass: int) -> str:
+    bass = _clamp_tone(bass)
     return 'Z{}BASS{:0=2}'.format(int(zone),bass)
 
 def _format_set_source(zone: int, source: int) -> str:
     source = int(max(1, min(int(source), 6)))
     return 'Z{}SRC{}'.format(int(zone),source)
 
+def _display_text(text: str) -> str:
+    # printable ascii only, the double quote ends the text on the Nuvo
+    text = ''.join(c for c in str(text) if ' ' <= c <= '~' and c != '"')
+    return text[:DISPLAY_WIDTH]
+
+def _format_set_display_line(source: int, line: int, text: str) -> str:
+    #CMD *SsDISPLINEl"text"  where "s" is the Source number and "l" the display line
+    line = int(max(1, min(int(line), DISPLAY_LINES)))
+    return 'S{}DISPLINE{}"{}"'.format(int(source),line,_display_text(text))
+
+def _format_set_source_name(source: int, name: str) -> str:
+    #CMD *SCFGsNAME"name"  where "s" is the Source number
+    return 'SCFG{}NAME"{}"'.format(int(source),_display_text(name))
+
+def _format_set_zone_name(zone: int, name: str) -> str:
+    #CMD *ZCFGzNAME"name"  where "z" is the Zone number
+    return 'ZCFG{}NAME"{}"'.format(int(zone),_display_text(name))
+
 
 
 def get_nuvo(port_url):
@@ -281,7 +854,10 @@ def get_nuvo(port_url):
     def synchronized(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            start = profiler.start('lock_wait')
             with lock:
+                if start is not None:
+                    profiler.record('lock_wait', start)
                 return func(*args, **kwargs)
         return wrapper
 
@@ -296,25 +872,37 @@ def get_nuvo(port_url):
             self._port.timeout = TIMEOUT_OP
             self._port.write_timeout = TIMEOUT_OP
             self._port.open()
+            self.stats = RequestStats()
+            self._settings = SettingsCache()
+            self.state = ZoneStateStore()
+            self._page = {}     # zone -> (ZoneStatus before paging, see _paged_before, paged source, paged volume)
+            self._display = DisplayQueue()
+            self._display_ready = threading.Event()
+            self._display_thread = None
 
 
-        def _process_request(self, request: str):
+        def _process_request(self, request: str, deadline: float = None):
             """
             Send data to serial
             :param request: request that is sent ot the Nuvo
-            :return: ascii string returned by Nuvo
+            :param deadline: time.monotonic() after which the response is given up on
+            :return: bytes returned by Nuvo
             """
 
+            start = profiler.start('write')
+
             # clear the port
             self._port.reset_output_buffer()
             self._port.reset_input_buffer()
 
             # send request
             #format and send output command
-            lineout = "*" + request + "\r"
-            self._port.write(lineout.encode())
+            lineout = _format_request(request)
+            self._port.write(lineout)
             self._port.flush()
             _LOGGER.debug('Sending "%s"', lineout)
+            if start is not None:
+                start = profiler.record('write', start)
 
             # receive response
             result = bytearray()
@@ -325,58 +913,127 @@ def get_nuvo(port_url):
                 if not c:
                     raise serial.SerialTimeoutException(
                         'Connection timed out! Last received bytes {}'.format([hex(a) for a in result]))
+                if start is not None and not result:
+                    start = profiler.record('first_byte', start)
                 result += c
                 if result [-LEN_EOL:] == EOL:
                     break
+                if deadline is not None and time.monotonic() > deadline:
+                    # the timeout is per byte, a slow trickle would otherwise run past the budget
+                    raise serial.SerialTimeoutException(
+                        'Response too slow! Received bytes {}'.format([hex(a) for a in result]))
+            if start is not None and result:
+                profiler.record('byte_loop', start)
             ret = bytes (result)
             _LOGGER.debug('Received "%s"', ret)
-            return ret.decode('ascii')
-            
+            return ret
+
+        def _send_request(self, request: str, parse=None):
+            """
+            Send data to serial, repeating idempotent requests that time out or get a garbled response
+            :param request: request that is sent ot the Nuvo
+            :param parse: optional function turning the response into an object, None when it does not match
+            :return: ascii string returned by Nuvo, or what parse returned
+            """
+            deadline = time.monotonic() + RETRY_BUDGET
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    ret = _decode_response(request, self._process_request(request, deadline), parse)
+                except (serial.SerialTimeoutException, ResponseError):
+                    if not _may_retry(request, attempt, deadline):
+                        self.stats.record(attempt, False)
+                        raise
+                    _LOGGER.debug('Retrying "%s", try %d', request, attempt + 1)
+                    continue
+                self.stats.record(attempt, True)
+                return ret
 
         @synchronized
         def zone_status(self, zone: int):
             # Returns status of the zone
-            return ZoneStatus.from_string(self._process_request(_format_zone_status_request(zone)))
+            status = self._send_request(_format_zone_status_request(zone), ZoneStatus.from_string)
+            if status:
+                self._settings.apply(status)
+                self.state.put(status)
+            return status
+
+        def cached_zone_status(self, zone: int):
+            return self.state.get(zone)
+
+        def try_zone_status(self, zone: int):
+            # Another caller holds the port (i.e. restore_zone), don't queue up behind it
+            if not lock.acquire(blocking=False):
+                return self.state.get(zone)
+            try:
+                status = self.zone_status(zone)
+            finally:
+                lock.release()
+            # the port was free, a failed read is reported instead of hidden behind old state
+            if status is None:
+                return None
+            return self.state.get(zone)
+
+        def zone_settings(self, zone: int, max_age: float = None):
+            # Cached settings are returned without waiting for the port
+            settings = self._settings.get(zone, max_age)
+            if settings is None:
+                settings = self._read_zone_settings(zone)
+            return settings
+
+        def cached_zone_settings(self, zone: int):
+            # Never touches the port, may be older than SETTINGS_TTL, None when never read
+            return self._settings.last(zone)
+
+        @synchronized
+        def _read_zone_settings(self, zone: int):
+            settings = self._send_request(_format_zone_settings_request(zone), ZoneSettings.from_string)
+            if settings:
+                self._settings.put(settings)
+            return settings
 
         @synchronized
         def set_power(self, zone: int, power: bool):
             # Set zone power
-            self._process_request(_format_set_power(zone, power))
+            self._send_request(_format_set_power(zone, power))
             
         @synchronized
         def set_mute(self, zone: int, mute: bool):
             # Mute the zone
-            self._process_request(_format_set_mute(zone, mute))
+            self._send_request(_format_set_mute(zone, mute))
 
         @synchronized
         def set_volume(self, zone: int, volume: int):
             # set volume of the zone
-            self._process_request(_format_set_volume(zone, volume))
+            self._send_request(_format_set_volume(zone, volume))
 
         @synchronized
         def set_volume_up(self, zone: int):
             # increase the volume by 1
-            self._process_request(_format_set_volume_up(zone))
+            self._send_request(_format_set_volume_up(zone))
 
         @synchronized
         def set_volume_down(self, zone: int):
             # decrease the volume by 1
-            self._process_request(_format_set_volume_down(zone))
+            self._send_request(_format_set_volume_down(zone))
 
         @synchronized
         def set_treble(self, zone: int, treble: int):
             # set the treble of the zone
-            self._process_request(_format_set_treble(zone, treble))
+            self._send_request(_format_set_treble(zone, treble))
+            self._settings.write(zone, treble=treble)
 
         @synchronized
         def set_bass(self, zone: int, bass: int):
             # set the bass of the zone
-            self._process_request(_format_set_bass(zone, bass))
+            self._send_request(_format_set_bass(zone, bass))
+            self._settings.write(zone, bass=bass)
 
         @synchronized
         def set_source(self, zone: int, source: int):
             # set the source of the zone
-            self._process_request(_format_set_source(zone, source))
+            self._send_request(_format_set_source(zone, source))
 
         @synchronized
         def restore_zone(self, status: ZoneStatus):
@@ -384,14 +1041,116 @@ def get_nuvo(port_url):
             self.set_mute(status.zone, status.mute)
             self.set_volume(status.zone, status.volume)
             self.set_source(status.zone, status.source)
-            self.set_treble(status.zone, status.treble)
-            self.set_bass(status.zone, status.bass)
+            if status.treble is not None:
+                self.set_treble(status.zone, status.treble)
+            if status.bass is not None:
+                self.set_bass(status.zone, status.bass)
+
+        @synchronized
+        def page(self, zones, source: int, volume: int):
+            source = int(source)
+            volume = int(volume)
+            for zone in zones:
+                zone = int(zone)
+                if zone in self._page:
+                    # a zone already paged keeps its state from before the first page
+                    before, paged_source, paged_volume = self._page[zone]
+                    status = _paged_status(zone, paged_source, paged_volume)
+                else:
+                    cached = self.state.get(zone)
+                    before = status = cached.status if cached and not cached.stale else None
+                    if status is None:
+                        try:
+                            before = status = self.zone_status(zone)
+                        except serial.SerialException:
+                            status = None
+                    if status is None:
+                        _LOGGER.warning('Zone %d has no known state, not paging it', zone)
+                        continue
+                    if not status.power or status.mute:
+                        # recorded before sending, so unpage() also undoes a page that failed half way
+                        self._page[zone] = (_paged_before(before), source, volume)
+                        muted = status.mute
+                        if not status.power:
+                            status = self._send_request(_format_set_power(zone, True), ZoneStatus.from_string)
+                            muted = status.mute
+                        if status.mute:
+                            status = self._send_request(_format_set_mute(zone, False), ZoneStatus.from_string)
+                        before = _paged_before(before, status, muted)
+                self._page[zone] = (before, source, volume)
+                for request in _page_requests(status, source, volume):
+                    self._send_request(request)
+
+        @synchronized
+        def unpage(self, zones=None):
+            if zones is None:
+                zones = list(self._page)
+            for zone in zones:
+                zone = int(zone)
+                if zone not in self._page:
+                    continue
+                before, source, volume = self._page[zone]
+                for request in _unpage_requests(before, source, volume):
+                    self._send_request(request)
+                # forgotten only once restored, a failure leaves the zone to the next unpage()
+                del self._page[zone]
+
+        def set_display_line(self, source: int, line: int, text: str):
+            self._queue_display(('line', int(source), int(line)),
+                                _format_set_display_line(source, line, text))
+
+        def set_source_name(self, source: int, name: str):
+            self._queue_display(('source', int(source)), _format_set_source_name(source, name))
+
+        def set_zone_name(self, zone: int, name: str):
+            self._queue_display(('zone', int(zone)), _format_set_zone_name(zone, name))
+
+        def wait_display(self, timeout: float = None):
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._display.idle:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+                time.sleep(DISPLAY_INTERVAL)
+            return True
+
+        def _queue_display(self, field, request: str):
+            if not self._display.update(field, request):
+                return
+            if self._display_thread is None or not self._display_thread.is_alive():
+                self._display_thread = threading.Thread(
+                    target=self._display_worker, name='nuvo-display', daemon=True)
+                self._display_thread.start()
+            self._display_ready.set()
+
+        def _display_worker(self):
+            # Sends one display request at a time and only when no control command holds the port
+            while True:
+                self._display_ready.wait()
+                self._display_ready.clear()
+                while True:
+                    item = self._display.pop()
+                    if item is None:
+                        break
+                    while not lock.acquire(blocking=False):
+                        time.sleep(DISPLAY_INTERVAL)
+                    try:
+                        self._send_request(item[1])
+                    except Exception as err:
+                        # any error, the worker must keep running or all display output stops
+                        _LOGGER.warning('Could not send keypad display "%s" - %s', item[1], err)
+                        self._display.failed(*item)
+                        delay = DISPLAY_RETRY
+                    else:
+                        self._display.sent(*item)
+                        delay = DISPLAY_INTERVAL
+                    finally:
+                        lock.release()
+                    time.sleep(delay)
 
     return NuvoSync(port_url)
   
 
-@asyncio.coroutine
-def get_async_nuvo(port_url, loop):
+async def get_async_nuvo(port_url, loop):
     """
     Return asynchronous version of Nuvo interface
     :param port_url: serial port, i.e. '/dev/ttyUSB0'
@@ -401,72 +1160,219 @@ def get_async_nuvo(port_url, loop):
     lock = asyncio.Lock()
 
     def locked_coro(coro):
-        @asyncio.coroutine
         @wraps(coro)
-        def wrapper(*args, **kwargs):
-            with (yield from lock):
-                return (yield from coro(*args, **kwargs))
+        async def wrapper(*args, **kwargs):
+            start = profiler.start('lock_wait')
+            async with lock:
+                if start is not None:
+                    profiler.record('lock_wait', start)
+                return await coro(*args, **kwargs)
         return wrapper
 
     class NuvoAsync(Nuvo):
         def __init__(self, nuvo_protocol):
             self._protocol = nuvo_protocol
+            self.stats = RequestStats()
+            self._settings = SettingsCache()
+            self.state = ZoneStateStore()
+            self._page = {}     # zone -> (ZoneStatus before paging, see _paged_before, paged source, paged volume)
+            self._display = DisplayQueue()
+            self._display_ready = asyncio.Event()
+            self._display_task = None
+
+        async def _send(self, request: str, parse=None):
+            deadline = time.monotonic() + RETRY_BUDGET
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    response = await asyncio.wait_for(self._protocol.send(_format_request(request)),
+                                                      max(deadline - time.monotonic(), TIMEOUT_OP))
+                    ret = _decode_response(request, response, parse)
+                except (asyncio.TimeoutError, ResponseError):
+                    if not _may_retry(request, attempt, deadline):
+                        self.stats.record(attempt, False)
+                        raise
+                    _LOGGER.debug('Retrying "%s", try %d', request, attempt + 1)
+                    continue
+                self.stats.record(attempt, True)
+                return ret
 
         @locked_coro
-        @asyncio.coroutine
-        def zone_status(self, zone: int):
-            string = yield from self._protocol.send(_format_zone_status_request(zone))
-            return ZoneStatus.from_string(string)
+        async def zone_status(self, zone: int):
+            status = await self._send(_format_zone_status_request(zone), ZoneStatus.from_string)
+            if status:
+                self._settings.apply(status)
+                self.state.put(status)
+            return status
+
+        def cached_zone_status(self, zone: int):
+            return self.state.get(zone)
+
+        async def try_zone_status(self, zone: int):
+            if lock.locked():
+                return self.state.get(zone)
+            status = await self.zone_status(zone)
+            if status is None:
+                return None
+            return self.state.get(zone)
+
+        async def zone_settings(self, zone: int, max_age: float = None):
+            settings = self._settings.get(zone, max_age)
+            if settings is None:
+                settings = await self._read_zone_settings(zone)
+            return settings
+
+        def cached_zone_settings(self, zone: int):
+            return self._settings.last(zone)
 
         @locked_coro
-        @asyncio.coroutine
-        def set_power(self, zone: int, power: bool):
-            yield from self._protocol.send(_format_set_power(zone, power))
+        async def _read_zone_settings(self, zone: int):
+            settings = await self._send(_format_zone_settings_request(zone), ZoneSettings.from_string)
+            if settings:
+                self._settings.put(settings)
+            return settings
 
         @locked_coro
-        @asyncio.coroutine
-        def set_mute(self, zone: int, mute: bool):
-            yield from self._protocol.send(_format_set_mute(zone, mute))
+        async def set_power(self, zone: int, power: bool):
+            await self._send(_format_set_power(zone, power))
 
         @locked_coro
-        @asyncio.coroutine
-        def set_volume(self, zone: int, volume: int):
-            yield from self._protocol.send(_format_set_volume(zone, volume))
+        async def set_mute(self, zone: int, mute: bool):
+            await self._send(_format_set_mute(zone, mute))
 
         @locked_coro
-        @asyncio.coroutine
-        def set_volume_up(self, zone: int):
-            yield from self._protocol.send(_format_set_volume_up(zone))
+        async def set_volume(self, zone: int, volume: int):
+            await self._send(_format_set_volume(zone, volume))
 
         @locked_coro
-        @asyncio.coroutine
-        def set_volume_down(self, zone: int):
-            yield from self._protocol.send(_format_set_volume_down(zone))
+        async def set_volume_up(self, zone: int):
+            await self._send(_format_set_volume_up(zone))
 
         @locked_coro
-        @asyncio.coroutine
-        def set_treble(self, zone: int, treble: float):
-            yield from self._protocol.send(_format_set_treble(zone, treble))
+        async def set_volume_down(self, zone: int):
+            await self._send(_format_set_volume_down(zone))
 
         @locked_coro
-        @asyncio.coroutine
-        def set_bass(self, zone: int, bass: float):
-            yield from self._protocol.send(_format_set_bass(zone, bass))
+        async def set_treble(self, zone: int, treble: int):
+            await self._send(_format_set_treble(zone, treble))
+            self._settings.write(zone, treble=treble)
 
         @locked_coro
-        @asyncio.coroutine
-        def set_source(self, zone: int, source: int):
-            yield from self._protocol.send(_format_set_source(zone, source))
+        async def set_bass(self, zone: int, bass: int):
+            await self._send(_format_set_bass(zone, bass))
+            self._settings.write(zone, bass=bass)
 
         @locked_coro
-        @asyncio.coroutine
-        def restore_zone(self, status: ZoneStatus):
-            yield from self._protocol.send(_format_set_power(status.zone, status.power))
-            yield from self._protocol.send(_format_set_mute(status.zone, status.mute))
-            yield from self._protocol.send(_format_set_volume(status.zone, status.volume))
-            yield from self._protocol.send(_format_set_source(status.zone, status.source))
-            yield from self._protocol.send(_format_set_treble(status.zone, status.treble))
-            yield from self._protocol.send(_format_set_bass(status.zone, status.bass))
+        async def set_source(self, zone: int, source: int):
+            await self._send(_format_set_source(zone, source))
+
+        @locked_coro
+        async def restore_zone(self, status: ZoneStatus):
+            await self._send(_format_set_power(status.zone, status.power))
+            await self._send(_format_set_mute(status.zone, status.mute))
+            await self._send(_format_set_volume(status.zone, status.volume))
+            await self._send(_format_set_source(status.zone, status.source))
+            if status.treble is not None:
+                await self._send(_format_set_treble(status.zone, status.treble))
+                self._settings.write(status.zone, treble=status.treble)
+            if status.bass is not None:
+                await self._send(_format_set_bass(status.zone, status.bass))
+                self._settings.write(status.zone, bass=status.bass)
+
+        @locked_coro
+        async def page(self, zones, source: int, volume: int):
+            source = int(source)
+            volume = int(volume)
+            for zone in zones:
+                zone = int(zone)
+                if zone in self._page:
+                    before, paged_source, paged_volume = self._page[zone]
+                    status = _paged_status(zone, paged_source, paged_volume)
+                else:
+                    cached = self.state.get(zone)
+                    before = status = cached.status if cached and not cached.stale else None
+                    if status is None:
+                        try:
+                            before = status = await self._send(_format_zone_status_request(zone),
+                                                               ZoneStatus.from_string)
+                        except (asyncio.TimeoutError, ResponseError):
+                            status = None
+                    if status is None:
+                        _LOGGER.warning('Zone %d has no known state, not paging it', zone)
+                        continue
+                    if not status.power or status.mute:
+                        self._page[zone] = (_paged_before(before), source, volume)
+                        muted = status.mute
+                        if not status.power:
+                            status = await self._send(_format_set_power(zone, True), ZoneStatus.from_string)
+                            muted = status.mute
+                        if status.mute:
+                            status = await self._send(_format_set_mute(zone, False), ZoneStatus.from_string)
+                        before = _paged_before(before, status, muted)
+                self._page[zone] = (before, source, volume)
+                for request in _page_requests(status, source, volume):
+                    await self._send(request)
+
+        @locked_coro
+        async def unpage(self, zones=None):
+            if zones is None:
+                zones = list(self._page)
+            for zone in zones:
+                zone = int(zone)
+                if zone not in self._page:
+                    continue
+                before, source, volume = self._page[zone]
+                for request in _unpage_requests(before, source, volume):
+                    await self._send(request)
+                del self._page[zone]
+
+        def set_display_line(self, source: int, line: int, text: str):
+            self._queue_display(('line', int(source), int(line)),
+                                _format_set_display_line(source, line, text))
+
+        def set_source_name(self, source: int, name: str):
+            self._queue_display(('source', int(source)), _format_set_source_name(source, name))
+
+        def set_zone_name(self, zone: int, name: str):
+            self._queue_display(('zone', int(zone)), _format_set_zone_name(zone, name))
+
+        async def wait_display(self, timeout: float = None):
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._display.idle:
+                if deadline is not None and time.monotonic() > deadline:
+                    return False
+                await asyncio.sleep(DISPLAY_INTERVAL)
+            return True
+
+        def _queue_display(self, field, request: str):
+            if not self._display.update(field, request):
+                return
+            if self._display_task is None or self._display_task.done():
+                self._display_task = loop.create_task(self._display_worker())
+            self._display_ready.set()
+
+        async def _display_worker(self):
+            # Sends one display request at a time and only when no control command holds the port
+            while True:
+                await self._display_ready.wait()
+                self._display_ready.clear()
+                while True:
+                    item = self._display.pop()
+                    if item is None:
+                        break
+                    while lock.locked():
+                        await asyncio.sleep(DISPLAY_INTERVAL)
+                    try:
+                        async with lock:
+                            await self._send(item[1])
+                    except Exception as err:
+                        _LOGGER.warning('Could not send keypad display "%s" - %s', item[1], err)
+                        self._display.failed(*item)
+                        await asyncio.sleep(DISPLAY_RETRY)
+                        continue
+                    self._display.sent(*item)
+                    await asyncio.sleep(DISPLAY_INTERVAL)
 
     class NuvoProtocol(asyncio.Protocol):
         def __init__(self, loop):
@@ -474,8 +1380,8 @@ def get_async_nuvo(port_url, loop):
             self._loop = loop
             self._lock = asyncio.Lock()
             self._transport = None
-            self._connected = asyncio.Event(loop=loop)
-            self.q = asyncio.Queue(loop=loop)
+            self._connected = asyncio.Event()
+            self.q = asyncio.Queue()
 
         def connection_made(self, transport):
             self._transport = transport
@@ -483,30 +1389,38 @@ def get_async_nuvo(port_url, loop):
             _LOGGER.debug('port opened %s', self._transport)
 
         def data_received(self, data):
-            asyncio.ensure_future(self.q.put(data), loop=self._loop)
+            self.q.put_nowait(data)
 
-        @asyncio.coroutine
-        def send(self, request: bytes, skip=0):
-            yield from self._connected.wait()
+        async def send(self, request: bytes, skip=0):
+            await self._connected.wait()
             result = bytearray()
             # Only one transaction at a time
-            with (yield from self._lock):
+            async with self._lock:
+                start = profiler.start('write')
                 self._transport.serial.reset_output_buffer()
                 self._transport.serial.reset_input_buffer()
                 while not self.q.empty():
                     self.q.get_nowait()
                 self._transport.write(request)
+                if start is not None:
+                    start = profiler.record('write', start)
                 try:
                     while True:
-                        result += yield from asyncio.wait_for(self.q.get(), TIMEOUT_OP, loop=self._loop)
+                        data = await asyncio.wait_for(self.q.get(), TIMEOUT_OP)
+                        if start is not None and not result:
+                            start = profiler.record('first_byte', start)
+                        result += data
                         if len(result) > skip and result[-LEN_EOL:] == EOL:
+                            if start is not None:
+                                profiler.record('byte_loop', start)
                             ret = bytes(result)
                             _LOGGER.debug('Received "%s"', ret)
-                            return ret.decode('ascii')
+                            return ret
                 except asyncio.TimeoutError:
-                    _LOGGER.error("Timeout during receiving response for command '%s', received='%s'", request, result)
+                    # NuvoAsync._send retries idempotent requests and counts failures in its stats
+                    _LOGGER.debug("Timeout during receiving response for command '%s', received='%s'", request, result)
                     raise
 
-    _, protocol = yield from create_serial_connection(loop, functools.partial(NuvoProtocol, loop),
+    _, protocol = await create_serial_connection(loop, functools.partial(NuvoProtocol, loop),
                                                       port_url, baudrate=57600)
     return NuvoAsync(protocol)
@@ -0,0 +1,259 @@
+import threading
+import time
+
+import pytest
+
+import pynuvo3
+from emulator import NuvoEmulator, _Handler, _Server
+from pynuvo3 import (
+    DisplayQueue,
+    Profiler,
+    ResponseError,
+    SettingsCache,
+    ZoneSettings,
+    ZoneStateStore,
+    ZoneStatus,
+    _decode_response,
+    _may_retry,
+    _page_requests,
+    _paged_before,
+    _paged_status,
+    _unpage_requests,
+)
+
+
+def status(string):
+    return ZoneStatus.from_string(string)
+
+
+# retry policy
+
+def test_retry_attempts_fit_in_budget():
+    assert pynuvo3.RETRY_ATTEMPTS * pynuvo3.TIMEOUT_OP <= pynuvo3.RETRY_BUDGET
+
+
+def test_may_retry_idempotent_within_budget():
+    deadline = time.monotonic() + pynuvo3.RETRY_BUDGET
+    assert _may_retry('Z1STATUS?', 1, deadline)
+    assert _may_retry('Z1VOL40', 2, deadline)
+    assert not _may_retry('Z1VOL40', pynuvo3.RETRY_ATTEMPTS, deadline)
+
+
+def test_may_retry_never_relative_volume():
+    deadline = time.monotonic() + pynuvo3.RETRY_BUDGET
+    assert not _may_retry('Z1VOL+', 1, deadline)
+    assert not _may_retry('Z1VOL-', 1, deadline)
+
+
+def test_may_retry_not_past_deadline():
+    assert not _may_retry('Z1STATUS?', 1, time.monotonic() + pynuvo3.TIMEOUT_OP / 2)
+
+
+def test_decode_response_garbled_and_unparseable():
+    with pytest.raises(ResponseError):
+        _decode_response('Z1STATUS?', b'#Z1,\xff\r\n')
+    with pytest.raises(ResponseError):
+        _decode_response('Z1STATUS?', b'#Z1,NOISE\r\n', ZoneStatus.from_string)
+    assert _decode_response('Z1STATUS?', b'#Z1,OFF\r\n', ZoneStatus.from_string).power is False
+
+
+# zone settings
+
+def test_zone_settings_from_string():
+    settings = ZoneSettings.from_string('#Z2,OR0,BASS-04,TREB+02,GRP1,VRST0\r\n')
+    assert (settings.zone, settings.bass, settings.treble) == (2, -4, 2)
+    assert settings.extra == {'OR': 0, 'GRP': 1, 'VRST': 0}
+
+
+def test_zone_settings_ignores_status():
+    assert ZoneSettings.from_string('#Z1,ON,SRC4,VOL60,DND0,LOCK0') is None
+
+
+def test_set_treble_bass_clamped():
+    assert pynuvo3._format_set_treble(1, -20) == 'Z1TREB-12'
+    assert pynuvo3._format_set_bass(1, 20) == 'Z1BASS12'
+
+
+def test_settings_cache_keeps_last_value_after_ttl():
+    cache = SettingsCache(ttl=0)
+    cache.put(ZoneSettings(1, -2, 4))
+    time.sleep(0.01)
+    assert cache.get(1) is None
+    assert cache.last(1).treble == 4
+    restored = cache.apply(status('#Z1,ON,SRC4,VOL60,DND0,LOCK0'))
+    assert (restored.treble, restored.bass) == (4, -2)
+    # a write keeps the entry expired for get() but shows the clamped value in last()
+    cache.write(1, treble=20)
+    assert cache.get(1) is None
+    assert (cache.last(1).treble, cache.last(1).bass) == (12, -2)
+
+
+# paging
+
+def test_page_requests_minimal():
+    assert _page_requests(status('#Z1,ON,SRC4,VOL60,DND0,LOCK0'), 6, 20) == ['Z1SRC6', 'Z1VOL20']
+    assert _page_requests(status('#Z2,OFF'), 6, 20) == ['Z2ON', 'Z2SRC6', 'Z2VOL20']
+    assert _page_requests(status('#Z3,ON,SRC2,MUTE,DND0,LOCK0'), 6, 20) == ['Z3SRC6', 'Z3MUTEOFF', 'Z3VOL20']
+    assert _page_requests(status('#Z4,ON,SRC6,VOL20,DND0,LOCK0'), 6, 20) == []
+
+
+def test_unpage_requests_restore_diff():
+    assert _unpage_requests(status('#Z1,ON,SRC4,VOL60,DND0,LOCK0'), 6, 20) == ['Z1SRC4', 'Z1VOL60']
+    # source and volume of an off or muted zone come from the reply to ON / MUTEOFF
+    off = _paged_before(status('#Z2,OFF'), status('#Z2,ON,SRC3,VOL50,DND0,LOCK0'))
+    assert _unpage_requests(off, 6, 20) == ['Z2SRC3', 'Z2VOL50', 'Z2OFF']
+    muted = _paged_before(status('#Z3,ON,SRC2,MUTE,DND0,LOCK0'), status('#Z3,ON,SRC2,VOL45,DND0,LOCK0'))
+    assert _unpage_requests(muted, 6, 20) == ['Z3SRC2', 'Z3VOL45', 'Z3MUTE']
+    # no reply to ON yet, the zone is only turned back off
+    assert _unpage_requests(_paged_before(status('#Z2,OFF')), 6, 20) == ['Z2OFF']
+
+
+def test_repage_starts_from_paged_state():
+    assert _page_requests(_paged_status(2, 5, 30), 2, 30) == ['Z2SRC2']
+
+
+# profiler
+
+def test_profiler_off_returns_none():
+    assert Profiler().start('parse') is None
+
+
+def test_profiler_samples_each_phase():
+    profiler = Profiler()
+    profiler.enable(4)
+    for _ in range(100):
+        for phase in ('update', 'lock_wait', 'write', 'parse'):
+            start = profiler.start(phase)
+            if start is not None:
+                profiler.record(phase, start)
+    assert {phase: stat['count'] for phase, stat in profiler.as_dict().items()} == \
+        {'update': 25, 'lock_wait': 25, 'write': 25, 'parse': 25}
+
+
+def test_profiler_reset_restarts_sampling():
+    profiler = Profiler()
+    profiler.enable(4)
+    for _ in range(3):
+        assert profiler.start('parse') is None
+    profiler.reset()
+    assert profiler.start('parse') is None
+
+
+# display queue
+
+def test_display_queue_skips_unchanged():
+    queue = DisplayQueue()
+    assert queue.update('line', 'X')
+    queue.sent(*queue.pop())
+    assert not queue.update('line', 'X')
+    assert queue.idle
+
+
+def test_display_queue_requeues_shown_text_while_other_in_flight():
+    queue = DisplayQueue()
+    queue.update('line', 'X')
+    queue.sent(*queue.pop())
+    queue.update('line', 'Y')
+    in_flight = queue.pop()
+    assert queue.update('line', 'X')
+    queue.sent(*in_flight)
+    assert queue.pop() == ('line', 'X')
+
+
+def test_display_queue_failed_goes_back_unless_newer():
+    queue = DisplayQueue()
+    queue.update('line', 'X')
+    item = queue.pop()
+    assert not queue.idle
+    queue.failed(*item)
+    assert queue.pop() == ('line', 'X')
+    queue.update('line', 'Z')
+    queue.failed('line', 'X')
+    assert queue.pop() == ('line', 'Z')
+
+
+# state store
+
+def test_state_store_versions_and_staleness():
+    store = ZoneStateStore()
+    first = store.put(status('#Z1,OFF'))
+    second = store.put(status('#Z1,ON,SRC4,VOL60,DND0,LOCK0'), updated=time.time() - pynuvo3.STATUS_STALE - 1)
+    assert second.version == first.version + 1 == store.version
+    assert store.get(1) is second
+    assert second.stale and not first.stale
+
+
+# against the emulator
+
+@pytest.fixture
+def nuvo():
+    server = _Server(('localhost', 0), _Handler)
+    server.emulator = NuvoEmulator()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield pynuvo3.get_nuvo('socket://localhost:{}'.format(server.server_address[1]))
+    server.shutdown()
+    server.server_close()
+
+
+def test_zone_status_round_trip(nuvo):
+    nuvo.set_power(1, True)
+    nuvo.set_volume(1, 30)
+    zone = nuvo.zone_status(1)
+    assert (zone.power, zone.volume) == (True, 30)
+    # the port is free, so this reads again instead of serving the cache
+    cached = nuvo.try_zone_status(1)
+    assert cached.status is not zone and cached.version == nuvo.state.version
+    assert nuvo.stats.first_try == 4
+
+
+def test_page_twice_then_unpage_restores(nuvo):
+    nuvo.set_power(1, True)
+    nuvo.set_source(1, 3)
+    nuvo.set_volume(1, 50)
+    nuvo.set_power(1, False)
+    nuvo.set_power(2, True)
+    nuvo.set_source(2, 2)
+    nuvo.set_volume(2, 40)
+    nuvo.set_power(3, True)
+    nuvo.set_volume(3, 45)
+    nuvo.set_mute(3, True)
+    for zone in (1, 2, 3):
+        nuvo.zone_status(zone)
+    nuvo.page([2], 5, 30)
+    nuvo.page([1, 3], 2, 30)
+    nuvo.unpage()
+    zone = nuvo.zone_status(2)
+    assert (int(zone.source), zone.volume) == (2, 40)
+    assert nuvo.zone_status(1).power is False
+    assert nuvo.zone_status(3).mute is True
+    # what was under OFF and MUTE is back once the zone is turned on or unmuted
+    nuvo.set_power(1, True)
+    nuvo.set_mute(3, False)
+    zone = nuvo.zone_status(1)
+    assert (int(zone.source), zone.volume) == (3, 50)
+    zone = nuvo.zone_status(3)
+    assert (int(zone.source), zone.volume) == (1, 45)
+
+
+def test_page_rereads_stale_state(nuvo):
+    nuvo.set_power(1, True)
+    nuvo.set_source(1, 4)
+    nuvo.state.put(status('#Z1,ON,SRC1,VOL10,DND0,LOCK0'), updated=time.time() - pynuvo3.STATUS_STALE - 1)
+    nuvo.page([1], 6, 30)
+    nuvo.unpage()
+    zone = nuvo.zone_status(1)
+    assert (int(zone.source), zone.volume) == (4, 40)
+
+
+def test_display_worker_sends(nuvo):
+    nuvo.set_display_line(1, 1, 'Hello')
+    nuvo.set_zone_name(1, 'Kitchen')
+    assert nuvo.wait_display(5)
+
+
+def test_set_treble_keeps_cached_settings(nuvo):
+    assert nuvo.zone_settings(1).treble == 0
+    nuvo.set_treble(1, 5)
+    assert nuvo.cached_zone_settings(1).treble == 5
+    nuvo.set_power(1, True)
+    assert nuvo.zone_status(1).treble == 5